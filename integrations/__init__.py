@@ -0,0 +1,5 @@
+"""
+Integrations for the Dr. Greenthumb Trademark Tracker
+Run each one as a module from the repository root, e.g.
+python -m integrations.calendar_sync
+"""
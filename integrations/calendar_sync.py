@@ -4,11 +4,68 @@ Calendar integration for trademark renewal deadlines
 Supports Google Calendar, Outlook, and iCal formats
 """
 
-import json
-from datetime import datetime, timedelta
+import hashlib
+from datetime import date, datetime, timedelta, timezone
 from pathlib import Path
+from urllib.parse import quote_plus, urlencode
 import os
 
+from integrations.jsonio import dumps, load_cached, loads
+
+def _fmt_date(d):
+    """Format a date as YYYYMMDD without going through strftime"""
+    return f"{d.year:04d}{d.month:02d}{d.day:02d}"
+
+def _fmt_utc(dt):
+    """Format a UTC datetime as an iCalendar YYYYMMDDTHHMMSSZ stamp"""
+    return f"{dt.year:04d}{dt.month:02d}{dt.day:02d}T{dt.hour:02d}{dt.minute:02d}{dt.second:02d}Z"
+
+_DESC_TEMPLATE = """Trademark: {name}
+Jurisdiction: {jurisdiction}
+Renewal Date: {renewal_date}
+Registration: {registration_number}
+
+Action: Review renewal requirements and prepare filing
+
+View in tracker: https://github.com/raphaelhaddock-blip/dr-greenthumb-trademark-tracker"""
+
+_EVENT_TEMPLATE = """BEGIN:VEVENT
+UID:{uid}
+DTSTAMP:{dtstamp}
+DTSTART;VALUE=DATE:{event_date}
+SUMMARY:{summary}
+DESCRIPTION:{description}
+STATUS:CONFIRMED
+SEQUENCE:0
+BEGIN:VALARM
+TRIGGER:-P1D
+ACTION:DISPLAY
+DESCRIPTION:Reminder
+END:VALARM
+END:VEVENT
+"""
+
+_CALENDAR_HEADER = """BEGIN:VCALENDAR
+VERSION:2.0
+PRODID:-//Dr. Greenthumb//Trademark Tracker//EN
+CALSCALE:GREGORIAN
+METHOD:PUBLISH
+X-WR-CALNAME:Trademark Deadlines
+X-WR-TIMEZONE:America/Los_Angeles
+X-WR-CALDESC:Dr. Greenthumb trademark renewal deadlines
+"""
+
+# Days before the renewal date that get a reminder event
+_REMINDER_DAYS = (90, 60, 30, 7)
+
+# Bump when the .ics output changes in a way the templates above don't show,
+# so cached event hashes stop matching and the file is regenerated
+_CALENDAR_FORMAT = 1
+
+_FORMAT_HASH = hashlib.blake2b(repr((
+    _CALENDAR_FORMAT, _CALENDAR_HEADER, _EVENT_TEMPLATE, _DESC_TEMPLATE, _REMINDER_DAYS
+)).encode(), digest_size=8)
+
 class CalendarSync:
     """Sync trademark deadlines to calendar systems"""
     
@@ -17,127 +74,147 @@ class CalendarSync:
     
     def load_trademarks(self, file):
         """Load trademark data"""
-        with open(file) as f:
-            return json.load(f)
+        return load_cached(file)
     
-    def generate_ical(self, output_file="trademark_deadlines.ics"):
-        """Generate iCalendar file for deadlines"""
-        ical_content = """BEGIN:VCALENDAR
-VERSION:2.0
-PRODID:-//Dr. Greenthumb//Trademark Tracker//EN
-CALSCALE:GREGORIAN
-METHOD:PUBLISH
-X-WR-CALNAME:Trademark Deadlines
-X-WR-TIMEZONE:America/Los_Angeles
-X-WR-CALDESC:Dr. Greenthumb trademark renewal deadlines
-"""
+    def _event_hashes(self):
+        """Hash every (trademark, days_before) event, in output order
         
+        Each hash covers the fields the event renders plus the output
+        format, so a template or schedule change also invalidates the cache.
+        A list rather than an id-keyed dict keeps duplicate ids from
+        overwriting each other.
+        """
+        hashes = []
         for tm in self.trademarks:
             if tm['status'] != 'active':
                 continue
+            # 0 stands for the deadline event itself
+            for days_before in _REMINDER_DAYS + (0,):
+                h = _FORMAT_HASH.copy()
+                h.update(repr((
+                    tm['id'], tm['renewal_date'], days_before, tm['name'],
+                    tm['jurisdiction'], tm.get('registration_number', 'N/A')
+                )).encode())
+                hashes.append(h.hexdigest())
+        return hashes
+    
+    def generate_ical(self, output_file="trademark_deadlines.ics",
+                      cache_file=".calendar_cache.json", force=False):
+        """Generate iCalendar file for deadlines
+        
+        Skips regeneration when output_file exists and no event has changed
+        since the hashes recorded in cache_file; pass force=True to rewrite.
+        """
+        hashes = self._event_hashes()
+        cache = {}
+        if os.path.exists(cache_file):
+            with open(cache_file, 'rb') as f:
+                cache = loads(f.read())
+        
+        if not force and os.path.exists(output_file) and cache.get(os.fspath(output_file)) == hashes:
+            print(f"✅ Calendar file up to date: {output_file}")
+            return output_file
+        
+        dtstamp = _fmt_utc(datetime.now(timezone.utc))
+        
+        with open(output_file, 'w', buffering=1 << 16) as f:
+            f.write(_CALENDAR_HEADER)
             
-            renewal_date = datetime.fromisoformat(tm['renewal_date'])
-            
-            # Create events at 90, 60, and 30 days before
-            for days_before in [90, 60, 30, 7]:
-                alert_date = renewal_date - timedelta(days=days_before)
+            for tm in self.trademarks:
+                if tm['status'] != 'active':
+                    continue
+                
+                renewal_date = date.fromisoformat(tm['renewal_date'])
+                
+                # Create events at 90, 60, 30 and 7 days before
+                for days_before in _REMINDER_DAYS:
+                    alert_date = renewal_date - timedelta(days=days_before)
+                    
+                    f.write(self._create_event(
+                        tm,
+                        alert_date,
+                        f"{days_before}-day reminder",
+                        dtstamp
+                    ))
                 
-                event = self._create_event(
+                # Create event for actual deadline
+                f.write(self._create_event(
                     tm,
-                    alert_date,
-                    f"{days_before}-day reminder"
-                )
-                ical_content += event
+                    renewal_date,
+                    "RENEWAL DEADLINE",
+                    dtstamp
+                ))
             
-            # Create event for actual deadline
-            deadline_event = self._create_event(
-                tm,
-                renewal_date,
-                "RENEWAL DEADLINE"
-            )
-            ical_content += deadline_event
+            f.write("END:VCALENDAR")
         
-        ical_content += "END:VCALENDAR"
-        
-        with open(output_file, 'w') as f:
-            f.write(ical_content)
+        cache[os.fspath(output_file)] = hashes
+        with open(cache_file, 'wb') as f:
+            f.write(dumps(cache))
         
         print(f"✅ Calendar file created: {output_file}")
         print(f"   Import this into Google Calendar, Outlook, or Apple Calendar")
         return output_file
     
-    def _create_event(self, trademark, event_date, event_type):
+    def _create_event(self, trademark, event_date, event_type, dtstamp):
         """Create iCalendar event"""
         uid = f"{trademark['id']}-{event_type.replace(' ', '-')}@drgreenthumbtm.com"
-        timestamp = datetime.now().strftime("%Y%m%dT%H%M%SZ")
-        event_date_str = event_date.strftime("%Y%m%d")
         
-        summary = f"TM: {trademark['name']} - {event_type}"
-        description = f"""Trademark: {trademark['name']}
-Jurisdiction: {trademark['jurisdiction']}
-Renewal Date: {trademark['renewal_date']}
-Registration: {trademark.get('registration_number', 'N/A')}
-
-Action: Review renewal requirements and prepare filing
-
-View in tracker: https://github.com/raphaelhaddock-blip/dr-greenthumb-trademark-tracker"""
-        
-        event = f"""BEGIN:VEVENT
-UID:{uid}
-DTSTAMP:{timestamp}
-DTSTART;VALUE=DATE:{event_date_str}
-SUMMARY:{summary}
-DESCRIPTION:{description.replace(chr(10), '\\n')}
-STATUS:CONFIRMED
-SEQUENCE:0
-BEGIN:VALARM
-TRIGGER:-P1D
-ACTION:DISPLAY
-DESCRIPTION:Reminder
-END:VALARM
-END:VEVENT
-"""
-        return event
+        params = {
+            'registration_number': 'N/A',
+            **trademark,
+            'uid': uid,
+            'dtstamp': dtstamp,
+            'event_date': _fmt_date(event_date),
+            'summary': f"TM: {trademark['name']} - {event_type}",
+        }
+        params['description'] = _DESC_TEMPLATE.format_map(params).replace("\n", "\\n")
+        return _EVENT_TEMPLATE.format_map(params)
     
     def generate_google_calendar_links(self):
-        """Generate Google Calendar quick-add links"""
-        links = []
-        
+        """Generate Google Calendar quick-add links, one trademark at a time"""
         for tm in self.trademarks:
             if tm['status'] != 'active':
                 continue
             
-            renewal_date = datetime.fromisoformat(tm['renewal_date'])
-            date_str = renewal_date.strftime("%Y%m%d")
+            renewal_date = date.fromisoformat(tm['renewal_date'])
+            date_str = _fmt_date(renewal_date)
             
             title = f"TM Renewal: {tm['name']} ({tm['jurisdiction']})"
             details = f"Registration: {tm.get('registration_number', 'N/A')}"
             
             # Google Calendar URL format
             base_url = "https://calendar.google.com/calendar/render"
-            params = f"action=TEMPLATE&text={title}&dates={date_str}/{date_str}&details={details}"
-            link = f"{base_url}?{params.replace(' ', '+')}"
+            params = urlencode({
+                "action": "TEMPLATE",
+                "text": title,
+                "dates": f"{date_str}/{date_str}",
+                "details": details
+            }, quote_via=quote_plus)
+            link = f"{base_url}?{params}"
             
-            links.append({
+            yield {
                 "trademark": tm['name'],
                 "jurisdiction": tm['jurisdiction'],
                 "date": tm['renewal_date'],
                 "link": link
-            })
-        
-        return links
+            }
+    
+    def list_google_calendar_links(self):
+        """Google Calendar quick-add links as a list"""
+        return list(self.generate_google_calendar_links())
     
     def export_reminders_markdown(self, output_file="CALENDAR_SETUP.md"):
         """Export calendar setup instructions"""
         links = self.generate_google_calendar_links()
         
-        content = """# Trademark Deadline Calendar Setup
+        with open(output_file, 'w', buffering=1 << 16) as f:
+            f.write("""# Trademark Deadline Calendar Setup
 
 ## Option 1: Import iCal File
 
 1. Generate the calendar file:
    ```bash
-   python integrations/calendar_sync.py
+   python -m integrations.calendar_sync
    ```
 
 2. Import `trademark_deadlines.ics` into your calendar app:
@@ -149,14 +226,14 @@ END:VEVENT
 
 Click these links to add individual deadlines:
 
-"""
-        
-        for link_data in links:
-            content += f"### {link_data['trademark']} - {link_data['jurisdiction']}\n"
-            content += f"**Renewal Date:** {link_data['date']}\n\n"
-            content += f"[Add to Google Calendar]({link_data['link']})\n\n"
-        
-        content += """## Reminder Schedule
+""")
+            
+            for link_data in links:
+                f.write(f"### {link_data['trademark']} - {link_data['jurisdiction']}\n")
+                f.write(f"**Renewal Date:** {link_data['date']}\n\n")
+                f.write(f"[Add to Google Calendar]({link_data['link']})\n\n")
+            
+            f.write("""## Reminder Schedule
 
 For each trademark, you'll receive reminders:
 - 📅 90 days before renewal
@@ -169,10 +246,7 @@ For each trademark, you'll receive reminders:
 
 The calendar file is automatically regenerated weekly by GitHub Actions.
 Re-import the latest file to stay synced.
-"""
-        
-        with open(output_file, 'w') as f:
-            f.write(content)
+""")
         
         print(f"✅ Calendar setup guide created: {output_file}")
         return output_file
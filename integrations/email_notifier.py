@@ -4,52 +4,42 @@ Email notification system for trademark alerts
 Supports SMTP, SendGrid, and other email providers
 """
 
-import json
+import copy
+import functools
 import os
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 import smtplib
 
-class EmailNotifier:
-    """Send email notifications for trademark alerts"""
-    
-    def __init__(self, config_file="config/email_config.json"):
-        self.config = self.load_config(config_file)
-    
-    def load_config(self, config_file):
-        """Load email configuration"""
-        if os.path.exists(config_file):
-            with open(config_file) as f:
-                return json.load(f)
-        
-        # Default configuration
-        return {
-            "smtp_server": os.getenv("SMTP_SERVER", "smtp.gmail.com"),
-            "smtp_port": int(os.getenv("SMTP_PORT", "587")),
-            "sender_email": os.getenv("SENDER_EMAIL", "alerts@drgreenthumbtm.com"),
-            "sender_password": os.getenv("SENDER_PASSWORD", ""),
-            "recipients": {
-                "legal_team": os.getenv("LEGAL_EMAIL", "legal@drgreenthumbtm.com").split(","),
-                "b_real": os.getenv("BREAL_EMAIL", "breal@drgreenthumbtm.com"),
-                "business_dev": os.getenv("BIZDEV_EMAIL", "bizdev@drgreenthumbtm.com")
-            }
+from integrations.jsonio import load_cached
+
+@functools.lru_cache(maxsize=1)
+def _default_config():
+    """Default configuration from environment variables, read once per process"""
+    return {
+        "smtp_server": os.getenv("SMTP_SERVER", "smtp.gmail.com"),
+        "smtp_port": int(os.getenv("SMTP_PORT", "587")),
+        "sender_email": os.getenv("SENDER_EMAIL", "alerts@drgreenthumbtm.com"),
+        "sender_password": os.getenv("SENDER_PASSWORD", ""),
+        "recipients": {
+            "legal_team": os.getenv("LEGAL_EMAIL", "legal@drgreenthumbtm.com").split(","),
+            "b_real": os.getenv("BREAL_EMAIL", "breal@drgreenthumbtm.com"),
+            "business_dev": os.getenv("BIZDEV_EMAIL", "bizdev@drgreenthumbtm.com")
         }
-    
-    def send_renewal_alert(self, trademark, days_until, severity="warning"):
-        """Send renewal alert email"""
-        subject = f"{'🔴 URGENT' if days_until <= 30 else '🟡 REMINDER'}: Trademark Renewal - {trademark['name']}"
-        
-        body = f"""
+    }
+
+_RENEWAL_TEMPLATE = """
         <html>
         <body>
             <h2>Trademark Renewal Alert</h2>
             
-            <p><strong>Trademark:</strong> {trademark['name']}</p>
-            <p><strong>Jurisdiction:</strong> {trademark['jurisdiction']}</p>
-            <p><strong>Renewal Date:</strong> {trademark['renewal_date']}</p>
+            <p><strong>Trademark:</strong> {name}</p>
+            <p><strong>Jurisdiction:</strong> {jurisdiction}</p>
+            <p><strong>Renewal Date:</strong> {renewal_date}</p>
             <p><strong>Days Until Renewal:</strong> {days_until}</p>
-            <p><strong>Registration #:</strong> {trademark.get('registration_number', 'N/A')}</p>
+            <p><strong>Registration #:</strong> {registration_number}</p>
             
             <h3>Action Required:</h3>
             <ul>
@@ -59,7 +49,7 @@ class EmailNotifier:
                 <li>Submit to trademark office</li>
             </ul>
             
-            <p><strong>Priority:</strong> {'HIGH' if days_until <= 30 else 'MEDIUM'}</p>
+            <p><strong>Priority:</strong> {priority}</p>
             
             <p>View in tracker: <a href="https://github.com/raphaelhaddock-blip/dr-greenthumb-trademark-tracker">GitHub</a></p>
             
@@ -68,22 +58,15 @@ class EmailNotifier:
         </body>
         </html>
         """
-        
-        recipients = self.config["recipients"]["legal_team"] + [self.config["recipients"]["b_real"]]
-        return self.send_email(recipients, subject, body)
-    
-    def send_overdue_alert(self, trademark, days_overdue):
-        """Send critical overdue alert"""
-        subject = f"🚨 CRITICAL: Overdue Trademark Renewal - {trademark['name']}"
-        
-        body = f"""
+
+_OVERDUE_TEMPLATE = """
         <html>
         <body style="color: #c00;">
             <h2 style="color: #c00;">⚠️ CRITICAL: OVERDUE TRADEMARK RENEWAL</h2>
             
-            <p><strong>Trademark:</strong> {trademark['name']}</p>
-            <p><strong>Jurisdiction:</strong> {trademark['jurisdiction']}</p>
-            <p><strong>Renewal Date:</strong> {trademark['renewal_date']}</p>
+            <p><strong>Trademark:</strong> {name}</p>
+            <p><strong>Jurisdiction:</strong> {jurisdiction}</p>
+            <p><strong>Renewal Date:</strong> {renewal_date}</p>
             <p><strong>DAYS OVERDUE:</strong> <span style="font-size: 24px; color: #c00;">{days_overdue}</span></p>
             
             <h3>IMMEDIATE ACTIONS REQUIRED:</h3>
@@ -104,34 +87,22 @@ class EmailNotifier:
         </body>
         </html>
         """
-        
-        # Send to everyone for critical alerts
-        recipients = (
-            self.config["recipients"]["legal_team"] + 
-            [self.config["recipients"]["b_real"]] +
-            [self.config["recipients"]["business_dev"]]
-        )
-        return self.send_email(recipients, subject, body, priority="high")
-    
-    def send_weekly_report(self, report_data):
-        """Send weekly portfolio report"""
-        subject = f"📊 Weekly Trademark Portfolio Report - {datetime.now().strftime('%Y-%m-%d')}"
-        
-        body = f"""
+
+_WEEKLY_TEMPLATE = """
         <html>
         <body>
             <h2>Dr. Greenthumb Trademark Portfolio - Weekly Report</h2>
             
             <h3>Portfolio Overview</h3>
             <ul>
-                <li>Total Active: {report_data['total_active']}</li>
-                <li>Renewals Within 90 Days: {report_data['upcoming_90']}</li>
-                <li>Renewals Within 30 Days: {report_data['upcoming_30']}</li>
-                <li>Overdue: {report_data['overdue']}</li>
+                <li>Total Active: {total_active}</li>
+                <li>Renewals Within 90 Days: {upcoming_90}</li>
+                <li>Renewals Within 30 Days: {upcoming_30}</li>
+                <li>Overdue: {overdue}</li>
             </ul>
             
             <h3>Action Items</h3>
-            {self._format_action_items(report_data['action_items'])}
+            {action_items}
             
             <h3>Pending Filings</h3>
             <ul>
@@ -146,9 +117,71 @@ class EmailNotifier:
         </body>
         </html>
         """
+
+class EmailNotifier:
+    """Send email notifications for trademark alerts"""
+    
+    def __init__(self, config_file="config/email_config.json"):
+        self.config = self.load_config(config_file)
+        self._pending = []
+        
+        r = self.config["recipients"]
+        self._renewal_recipients = tuple(r["legal_team"]) + (r["b_real"],)
+        # Send to everyone for critical alerts
+        self._overdue_recipients = self._renewal_recipients + (r["business_dev"],)
+        self._weekly_recipients = self._renewal_recipients
+        
+        self._smtp_addr = (self.config['smtp_server'], self.config['smtp_port'])
+        self._sender = self.config['sender_email']
+        # Use environment variable for password in production
+        self._password = self.config.get('sender_password') or os.getenv('EMAIL_PASSWORD') or None
+    
+    def load_config(self, config_file):
+        """Load email configuration"""
+        # Copy: the cached config is shared by every notifier in the process
+        if os.path.exists(config_file):
+            return copy.deepcopy(load_cached(config_file))
         
-        recipients = self.config["recipients"]["legal_team"] + [self.config["recipients"]["b_real"]]
-        return self.send_email(recipients, subject, body)
+        return copy.deepcopy(_default_config())
+    
+    def send_renewal_alert(self, trademark, days_until, severity="warning"):
+        """Send renewal alert email"""
+        return self.send_email(*self.build_renewal_alert(trademark, days_until, severity))
+    
+    def build_renewal_alert(self, trademark, days_until, severity="warning"):
+        """Build renewal alert as a (recipients, subject, body, priority) tuple"""
+        subject = f"{'🔴 URGENT' if days_until <= 30 else '🟡 REMINDER'}: Trademark Renewal - {trademark['name']}"
+        
+        params = {
+            'registration_number': 'N/A',
+            **trademark,
+            'days_until': days_until,
+            'priority': 'HIGH' if days_until <= 30 else 'MEDIUM',
+        }
+        body = _RENEWAL_TEMPLATE.format_map(params)
+        
+        return self._renewal_recipients, subject, body, "normal"
+    
+    def send_overdue_alert(self, trademark, days_overdue):
+        """Send critical overdue alert"""
+        return self.send_email(*self.build_overdue_alert(trademark, days_overdue))
+    
+    def build_overdue_alert(self, trademark, days_overdue):
+        """Build overdue alert as a (recipients, subject, body, priority) tuple"""
+        subject = f"🚨 CRITICAL: Overdue Trademark Renewal - {trademark['name']}"
+        
+        body = _OVERDUE_TEMPLATE.format_map({**trademark, 'days_overdue': days_overdue})
+        
+        return self._overdue_recipients, subject, body, "high"
+    
+    def send_weekly_report(self, report_data):
+        """Send weekly portfolio report"""
+        subject = f"📊 Weekly Trademark Portfolio Report - {datetime.now().strftime('%Y-%m-%d')}"
+        
+        params = {**report_data, 'action_items': self._format_action_items(report_data['action_items'])}
+        body = _WEEKLY_TEMPLATE.format_map(params)
+        
+        return self.send_email(self._weekly_recipients, subject, body)
     
     def _format_action_items(self, items):
         """Format action items as HTML"""
@@ -161,32 +194,34 @@ class EmailNotifier:
         html += "</ul>"
         return html
     
+    def _build_message(self, recipients, subject, body, priority="normal"):
+        """Build MIME message"""
+        msg = MIMEMultipart('alternative')
+        msg['From'] = self._sender
+        msg['To'] = ", ".join(recipients)
+        msg['Subject'] = subject
+        
+        if priority == "high":
+            msg['X-Priority'] = '1'
+            msg['Importance'] = 'high'
+        
+        msg.attach(MIMEText(body, 'html'))
+        return msg
+    
     def send_email(self, recipients, subject, body, priority="normal"):
         """Send email using SMTP"""
+        if self._password is None:
+            print("⚠️  No email password configured. Email not sent.")
+            print(f"Subject: {subject}")
+            print(f"To: {recipients}")
+            return False
+        
         try:
-            msg = MIMEMultipart('alternative')
-            msg['From'] = self.config['sender_email']
-            msg['To'] = ", ".join(recipients)
-            msg['Subject'] = subject
-            
-            if priority == "high":
-                msg['X-Priority'] = '1'
-                msg['Importance'] = 'high'
-            
-            msg.attach(MIMEText(body, 'html'))
+            msg = self._build_message(recipients, subject, body, priority)
             
-            # Use environment variable for password in production
-            password = self.config['sender_password'] or os.getenv('EMAIL_PASSWORD')
-            
-            if not password:
-                print("⚠️  No email password configured. Email not sent.")
-                print(f"Subject: {subject}")
-                print(f"To: {recipients}")
-                return False
-            
-            with smtplib.SMTP(self.config['smtp_server'], self.config['smtp_port']) as server:
+            with smtplib.SMTP(*self._smtp_addr) as server:
                 server.starttls()
-                server.login(self.config['sender_email'], password)
+                server.login(self._sender, self._password)
                 server.send_message(msg)
             
             print(f"✅ Email sent: {subject}")
@@ -195,6 +230,78 @@ class EmailNotifier:
         except Exception as e:
             print(f"❌ Failed to send email: {e}")
             return False
+    
+    def send_bulk(self, messages):
+        """Send (recipients, subject, body, priority) tuples over one SMTP session
+        
+        A message the server rejects is skipped and the batch carries on; a
+        session failure stops the batch. Returns the list of messages that
+        were not sent.
+        """
+        if not messages:
+            return []
+        
+        if self._password is None:
+            print(f"⚠️  No email password configured. {len(messages)} emails not sent.")
+            for recipients, subject, body, priority in messages:
+                print(f"Subject: {subject}")
+                print(f"To: {recipients}")
+            return list(messages)
+        
+        unsent = []
+        done = 0
+        try:
+            with smtplib.SMTP(*self._smtp_addr) as server:
+                server.starttls()
+                server.login(self._sender, self._password)
+                for message in messages:
+                    recipients, subject, body, priority = message
+                    try:
+                        server.send_message(self._build_message(recipients, subject, body, priority))
+                        print(f"✅ Email sent: {subject}")
+                    except (smtplib.SMTPRecipientsRefused, smtplib.SMTPResponseException) as e:
+                        print(f"❌ Failed to send email: {subject}: {e}")
+                        unsent.append(message)
+                    done += 1
+        except Exception as e:
+            print(f"❌ SMTP session failed, {len(messages) - done} emails not sent: {e}")
+            unsent.extend(messages[done:])
+        
+        return unsent
+    
+    def send_bulk_parallel(self, messages, workers=8):
+        """Send messages over up to `workers` concurrent SMTP sessions
+        
+        Each worker opens its own session and drains one shard. The number of
+        sessions is further capped by the optional "max_connections" config
+        key to stay under provider rate limits.
+        Returns the list of messages that were not sent.
+        """
+        max_connections = self.config.get('max_connections', workers)
+        if workers < 1 or max_connections < 1:
+            raise ValueError("workers and max_connections must be at least 1")
+        
+        workers = min(workers, max_connections, len(messages))
+        if len(messages) < 4 or workers <= 1:
+            return self.send_bulk(messages)
+        
+        shards = [messages[i::workers] for i in range(workers)]
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            return [m for unsent in pool.map(self.send_bulk, shards) for m in unsent]
+    
+    def queue(self, message):
+        """Queue a (recipients, subject, body, priority) tuple for the next flush()"""
+        self._pending.append(message)
+    
+    def flush(self):
+        """Send all queued messages over one SMTP session
+        
+        Messages that could not be sent stay queued for the next flush().
+        Returns the number of messages sent.
+        """
+        messages = self._pending
+        self._pending = self.send_bulk(messages)
+        return len(messages) - len(self._pending)
 
 if __name__ == "__main__":
     # Test email notification
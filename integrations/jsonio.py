@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+"""
+Shared JSON helpers for the tracker and integrations
+Uses orjson when installed; parsed files are cached until they change on disk
+"""
+
+import functools
+import json
+import os
+
+try:
+    import orjson
+    loads = orjson.loads
+    
+    def dumps(obj, indent=True):
+        """Serialise to UTF-8 bytes, indented by two spaces unless indent=False"""
+        if indent:
+            return orjson.dumps(obj, option=orjson.OPT_INDENT_2)
+        return orjson.dumps(obj)
+except ImportError:
+    loads = json.loads
+    
+    def dumps(obj, indent=True):
+        """Serialise to UTF-8 bytes, indented by two spaces unless indent=False"""
+        return json.dumps(obj, indent=2 if indent else None).encode()
+
+@functools.lru_cache(maxsize=8)
+def _load_cached(path, mtime):
+    with open(path, 'rb') as f:
+        return loads(f.read())
+
+def load_cached(path):
+    """Parse a JSON file once per (path, mtime)
+
+    The result is shared between callers and must not be mutated;
+    copy anything you need to change.
+    """
+    return _load_cached(os.fspath(path), os.stat(path).st_mtime)
@@ -3,9 +3,11 @@
 Connector to licensing database for territory conflict checking
 """
 
-import json
+import sys
 from datetime import datetime
 
+from integrations.jsonio import dumps, load_cached
+
 class LicensingConnector:
     """Check trademark territories against active licensing agreements"""
     
@@ -13,12 +15,20 @@ class LicensingConnector:
                  licensing_file="licensing_agreements.json"):
         self.trademarks = self.load_json(trademarks_file)
         self.licensing_agreements = self.load_json(licensing_file)
+        
+        # Inverted index: lowercased territory -> active agreements covering it.
+        # Kept on self because the loaded records are shared with the cache.
+        self._territory_to_agreements = {}
+        for agreement in self.licensing_agreements:
+            if agreement['status'] == 'active':
+                territories = {t.lower() for t in agreement.get('territories', ())}
+                for territory in territories:
+                    self._territory_to_agreements.setdefault(territory, []).append(agreement)
     
     def load_json(self, filename):
         """Load JSON data file"""
         try:
-            with open(filename) as f:
-                return json.load(f)
+            return load_cached(filename)
         except FileNotFoundError:
             return []
     
@@ -27,7 +37,7 @@ class LicensingConnector:
         conflicts = []
         
         for tm in self.trademarks:
-            if tm['status'] == 'pending' or tm['status'] == 'abandoned':
+            if tm['status'] in ('pending', 'abandoned'):
                 # Flag unfiled territories with active licensing
                 territory_conflicts = self._check_unfiled_territory(tm)
                 if territory_conflicts:
@@ -40,69 +50,64 @@ class LicensingConnector:
         conflicts = []
         jurisdiction = trademark['jurisdiction']
         
-        for agreement in self.licensing_agreements:
-            if jurisdiction.lower() in agreement.get('territories', []):
-                if agreement['status'] == 'active':
-                    conflicts.append({
-                        "trademark": trademark['name'],
-                        "jurisdiction": jurisdiction,
-                        "issue": "Operating without TM protection",
-                        "licensee": agreement['licensee'],
-                        "agreement_id": agreement['id'],
-                        "risk_level": "HIGH",
-                        "cost_to_file": "$3,900",
-                        "recommended_action": f"File trademark in {jurisdiction} immediately to protect licensed territory"
-                    })
+        for agreement in self._territory_to_agreements.get(jurisdiction.lower(), ()):
+            conflicts.append({
+                "trademark": trademark['name'],
+                "jurisdiction": jurisdiction,
+                "issue": "Operating without TM protection",
+                "licensee": agreement['licensee'],
+                "agreement_id": agreement['id'],
+                "risk_level": "HIGH",
+                "cost_to_file": "$3,900",
+                "recommended_action": f"File trademark in {jurisdiction} immediately to protect licensed territory"
+            })
         
         return conflicts
     
     def generate_territory_report(self):
         """Generate comprehensive territory coverage report"""
-        print("\n" + "="*80)
-        print("TRADEMARK & LICENSING TERRITORY ANALYSIS")
-        print("="*80 + "\n")
+        out = []
+        out.append("\n" + "="*80)
+        out.append("TRADEMARK & LICENSING TERRITORY ANALYSIS")
+        out.append("="*80 + "\n")
         
         # Get all territories from licensing
-        licensed_territories = set()
-        for agreement in self.licensing_agreements:
-            if agreement['status'] == 'active':
-                for territory in agreement.get('territories', []):
-                    licensed_territories.add(territory.lower())
+        licensed_territories = set(self._territory_to_agreements)
         
         # Get protected territories from trademarks
-        protected_territories = set()
-        for tm in self.trademarks:
-            if tm['status'] == 'active':
-                protected_territories.add(tm['jurisdiction'].lower())
+        protected_territories = {
+            tm['jurisdiction'].lower() for tm in self.trademarks if tm['status'] == 'active'
+        }
         
         # Find gaps
         unprotected = licensed_territories - protected_territories
         
-        print(f"TERRITORY COVERAGE:")
-        print(f"  Licensed Territories: {len(licensed_territories)}")
-        print(f"  Protected by Trademark: {len(protected_territories)}")
-        print(f"  🚨 UNPROTECTED: {len(unprotected)}\n")
+        out.append(f"TERRITORY COVERAGE:")
+        out.append(f"  Licensed Territories: {len(licensed_territories)}")
+        out.append(f"  Protected by Trademark: {len(protected_territories)}")
+        out.append(f"  🚨 UNPROTECTED: {len(unprotected)}\n")
         
         if unprotected:
-            print("CRITICAL: OPERATING WITHOUT TRADEMARK PROTECTION:\n")
+            out.append("CRITICAL: OPERATING WITHOUT TRADEMARK PROTECTION:\n")
             for territory in sorted(unprotected):
-                print(f"  - {territory.title()}")
-                print(f"    Risk: HIGH - Licensed but no TM protection")
-                print(f"    Action: File trademark immediately")
-                print(f"    Estimated Cost: $3,900\n")
+                out.append(f"  - {territory.title()}")
+                out.append(f"    Risk: HIGH - Licensed but no TM protection")
+                out.append(f"    Action: File trademark immediately")
+                out.append(f"    Estimated Cost: $3,900\n")
         
         # Territory conflicts
         conflicts = self.check_territory_conflicts()
         if conflicts:
-            print("\nLICENSING CONFLICTS:\n")
+            out.append("\nLICENSING CONFLICTS:\n")
             for conflict in conflicts:
-                print(f"  Trademark: {conflict['trademark']}")
-                print(f"  Territory: {conflict['jurisdiction']}")
-                print(f"  Licensee: {conflict['licensee']}")
-                print(f"  Issue: {conflict['issue']}")
-                print(f"  Action: {conflict['recommended_action']}\n")
+                out.append(f"  Trademark: {conflict['trademark']}")
+                out.append(f"  Territory: {conflict['jurisdiction']}")
+                out.append(f"  Licensee: {conflict['licensee']}")
+                out.append(f"  Issue: {conflict['issue']}")
+                out.append(f"  Action: {conflict['recommended_action']}\n")
         
-        print("="*80)
+        out.append("="*80)
+        sys.stdout.write("\n".join(out) + "\n")
         
         return {
             "licensed": len(licensed_territories),
@@ -134,8 +139,8 @@ if __name__ == "__main__":
         }
     ]
     
-    with open("licensing_agreements.json", 'w') as f:
-        json.dump(sample_licensing, f, indent=2)
+    with open("licensing_agreements.json", 'wb') as f:
+        f.write(dumps(sample_licensing))
     
     connector = LicensingConnector()
     report = connector.generate_territory_report()
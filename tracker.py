@@ -4,28 +4,94 @@ Dr. Greenthumb Trademark Tracker
 Automated trademark portfolio management
 """
 
-import json
-from datetime import datetime, timedelta
+import bisect
+import os
+import sys
+from datetime import date, datetime
 from pathlib import Path
 
+from integrations.jsonio import dumps, loads
+
 class TrademarkTracker:
     def __init__(self):
         self.data_file = Path("trademarks.json")
+        # Append-only log of records added since the last compact()
+        self.log_file = Path("trademarks.jsonl")
         self.trademarks = self.load_data()
     
     def load_data(self):
+        trademarks = []
         if self.data_file.exists():
-            with open(self.data_file) as f:
-                return json.load(f)
-        return []
+            trademarks = loads(self.data_file.read_bytes())
+        
+        logged = list(self._read_log())
+        if logged:
+            # Skip records already in the JSON file in case compact() was
+            # interrupted; ids alone can collide, so key on creation time too
+            seen = {self._record_key(tm) for tm in trademarks}
+            trademarks.extend(tm for tm in logged if self._record_key(tm) not in seen)
+        
+        for tm in trademarks:
+            self._prepare(tm)
+        return trademarks
+    
+    def _read_log(self):
+        if not self.log_file.exists():
+            return
+        with open(self.log_file, 'rb') as f:
+            for line in f:
+                if line.strip():
+                    yield loads(line)
+    
+    def _prepare(self, tm):
+        # Parse once on load; underscore keys are never written back to disk
+        renewal = tm.get('renewal_date')
+        tm['_renewal_dt'] = date.fromisoformat(renewal) if renewal else None
+        tm['_active'] = tm['status'] == 'active'
+    
+    def _record_key(self, tm):
+        return tm['id'], tm.get('created')
+    
+    def _public(self, tm):
+        return {k: v for k, v in tm.items() if not k.startswith('_')}
     
     def save_data(self):
-        with open(self.data_file, 'w') as f:
-            json.dump(self.trademarks, f, indent=2)
+        logged = list(self._read_log())
+        if logged:
+            # Keep records another tracker appended to the log after we
+            # loaded, since the log is removed below
+            seen = {self._record_key(tm) for tm in self.trademarks}
+            for tm in logged:
+                if self._record_key(tm) not in seen:
+                    self._prepare(tm)
+                    self.trademarks.append(tm)
+            
+            # Trackers appending at the same time can hand out the same id;
+            # renumber later duplicates so ids are unique on disk
+            used = set()
+            next_id = max(tm['id'] for tm in self.trademarks) + 1
+            for tm in self.trademarks:
+                if tm['id'] in used:
+                    tm['id'] = next_id
+                    next_id += 1
+                used.add(tm['id'])
+        
+        data = [self._public(tm) for tm in self.trademarks]
+        
+        # Write-then-rename so a crash never leaves a half-written file
+        tmp = self.data_file.with_suffix('.tmp')
+        tmp.write_bytes(dumps(data))
+        os.replace(tmp, self.data_file)
+        # Everything in the log is now in the JSON file
+        self.log_file.unlink(missing_ok=True)
     
-    def add_trademark(self, name, jurisdiction, filing_date, renewal_date):
+    def compact(self):
+        """Fold the append-only log into trademarks.json and clear it"""
+        self.save_data()
+    
+    def _new_trademark(self, name, jurisdiction, filing_date, renewal_date):
         tm = {
-            "id": len(self.trademarks) + 1,
+            "id": max((t['id'] for t in self.trademarks), default=0) + 1,
             "name": name,
             "jurisdiction": jurisdiction,
             "filing_date": filing_date,
@@ -33,54 +99,85 @@ class TrademarkTracker:
             "status": "active",
             "created": datetime.now().isoformat()
         }
+        self._prepare(tm)
         self.trademarks.append(tm)
+        return tm
+    
+    def add_trademark(self, name, jurisdiction, filing_date, renewal_date):
+        self._new_trademark(name, jurisdiction, filing_date, renewal_date)
         self.save_data()
         print(f"✅ Added: {name} ({jurisdiction})")
     
+    def add_trademark_fast(self, name, jurisdiction, filing_date, renewal_date):
+        """Append to trademarks.jsonl instead of rewriting trademarks.json
+        
+        Meant for bulk imports; call compact() afterwards so the other
+        integrations, which only read trademarks.json, see the new records.
+        """
+        tm = self._new_trademark(name, jurisdiction, filing_date, renewal_date)
+        with open(self.log_file, 'ab') as f:
+            f.write(dumps(self._public(tm), indent=False) + b"\n")
+        print(f"✅ Added: {name} ({jurisdiction})")
+    
     def get_upcoming(self, days=90):
-        today = datetime.now().date()
-        threshold = today + timedelta(days=days)
+        return self.get_upcoming_buckets((days,))[days]
+    
+    def get_upcoming_buckets(self, thresholds=(30, 60, 90), sort=True):
+        """Bucket active renewals for every threshold in a single pass.
+        
+        Buckets are cumulative, so a renewal 20 days out appears under 30,
+        60 and 90 - the same lists get_upcoming(days) would return. Pass
+        sort=False when only the bucket sizes are needed.
+        """
+        thresholds = sorted(thresholds)
+        today = date.today()
+        buckets = {days: [] for days in thresholds}
         
-        upcoming = []
         for tm in self.trademarks:
-            if tm['status'] != 'active':
+            if not tm['_active']:
+                continue
+            days_until = (tm['_renewal_dt'] - today).days
+            if days_until < 0:
                 continue
-            renewal = datetime.fromisoformat(tm['renewal_date']).date()
-            if today <= renewal <= threshold:
-                days_until = (renewal - today).days
-                upcoming.append({**tm, 'days_until': days_until})
+            entry = {**self._public(tm), 'days_until': days_until}
+            for days in thresholds[bisect.bisect_left(thresholds, days_until):]:
+                buckets[days].append(entry)
         
-        return sorted(upcoming, key=lambda x: x['days_until'])
+        if sort:
+            for upcoming in buckets.values():
+                upcoming.sort(key=lambda x: x['days_until'])
+        return buckets
     
     def generate_report(self):
-        print("\n" + "="*80)
-        print("DR. GREENTHUMB TRADEMARK PORTFOLIO")
-        print(f"Generated: {datetime.now().strftime('%Y-%m-%d %H:%M')}")
-        print("="*80 + "\n")
+        out = []
+        out.append("\n" + "="*80)
+        out.append("DR. GREENTHUMB TRADEMARK PORTFOLIO")
+        out.append(f"Generated: {datetime.now().strftime('%Y-%m-%d %H:%M')}")
+        out.append("="*80 + "\n")
         
-        active = [tm for tm in self.trademarks if tm['status'] == 'active']
-        print(f"Total Active: {len(active)}\n")
+        active = [tm for tm in self.trademarks if tm['_active']]
+        out.append(f"Total Active: {len(active)}\n")
         
-        upcoming_30 = self.get_upcoming(30)
-        upcoming_60 = self.get_upcoming(60)
-        upcoming_90 = self.get_upcoming(90)
+        # Only the 30-day bucket is listed, so only it needs sorting
+        buckets = self.get_upcoming_buckets((30, 60, 90), sort=False)
+        upcoming_30 = sorted(buckets[30], key=lambda x: x['days_until'])
         
-        print("RENEWAL ALERTS:")
-        print(f"  🔴 Within 30 days: {len(upcoming_30)}")
-        print(f"  🟠 Within 60 days: {len(upcoming_60)}")
-        print(f"  🟡 Within 90 days: {len(upcoming_90)}\n")
+        out.append("RENEWAL ALERTS:")
+        out.append(f"  🔴 Within 30 days: {len(upcoming_30)}")
+        out.append(f"  🟠 Within 60 days: {len(buckets[60])}")
+        out.append(f"  🟡 Within 90 days: {len(buckets[90])}\n")
         
         if upcoming_30:
-            print("URGENT RENEWALS (30 days):")
+            out.append("URGENT RENEWALS (30 days):")
             for tm in upcoming_30:
-                print(f"  - {tm['name']} ({tm['jurisdiction']})")
-                print(f"    Due: {tm['renewal_date']} ({tm['days_until']} days)")
-            print()
+                out.append(f"  - {tm['name']} ({tm['jurisdiction']})")
+                out.append(f"    Due: {tm['renewal_date']} ({tm['days_until']} days)")
+            out.append("")
         
-        print("="*80)
+        out.append("="*80)
+        sys.stdout.write("\n".join(out) + "\n")
 
 if __name__ == "__main__":
-    import sys
     tracker = TrademarkTracker()
     
     if "--report" in sys.argv:
@@ -98,5 +195,7 @@ if __name__ == "__main__":
             "2025-11-15",
             "2035-11-15"
         )
+    elif "--compact" in sys.argv:
+        tracker.compact()
     else:
         tracker.generate_report()